@@ -1,8 +1,11 @@
 # Run a test query like http://127.0.0.1:8000/bedrock/query?text=what%20projects%20has%20the%20student%20done?
 
 from fastapi import FastAPI, HTTPException, Query
+import asyncio
 import boto3
 import os
+from botocore.config import Config
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import load_dotenv
 
 # Load environment variables from .env file
@@ -15,9 +18,20 @@ MODEL_ARN = os.getenv("MODEL_ARN")
 
 app = FastAPI()
 
+# Thread pool for offloading synchronous boto3 calls so they don't block the
+# event loop; size it to match the Bedrock account concurrency limit
+_executor = ThreadPoolExecutor(max_workers=int(os.getenv("BEDROCK_EXECUTOR_WORKERS", "32")))
+
+# Widen the default 10-connection pool so concurrent calls aren't serialized
+_BOTO_CFG = Config(
+    max_pool_connections=int(os.getenv("BEDROCK_MAX_POOL_CONNECTIONS", "64")),
+    retries={"max_attempts": 3, "mode": "adaptive"},
+    tcp_keepalive=True,
+)
+
 # Initialize Boto3 client for Bedrock Agent Runtime
 def get_bedrock_client():
-    return boto3.client("bedrock-agent-runtime", region_name=AWS_REGION)
+    return boto3.client("bedrock-agent-runtime", region_name=AWS_REGION, config=_BOTO_CFG)
 
 @app.get("/")
 async def root():
@@ -27,15 +41,20 @@ async def root():
 async def query_bedrock(text: str = Query(..., description="Input text for the model")):
     client = get_bedrock_client()
     try:
-        response = client.retrieve_and_generate(
-            input={"text": text},
-            retrieveAndGenerateConfiguration={
-                "knowledgeBaseConfiguration": {
-                    "knowledgeBaseId": KNOWLEDGE_BASE_ID,
-                    "modelArn": MODEL_ARN
-                },
-                "type": "KNOWLEDGE_BASE"
-            }
+        # boto3 is synchronous; run it in the executor so the event loop
+        # keeps serving other requests during the Bedrock round trip
+        response = await asyncio.get_running_loop().run_in_executor(
+            _executor,
+            lambda: client.retrieve_and_generate(
+                input={"text": text},
+                retrieveAndGenerateConfiguration={
+                    "knowledgeBaseConfiguration": {
+                        "knowledgeBaseId": KNOWLEDGE_BASE_ID,
+                        "modelArn": MODEL_ARN
+                    },
+                    "type": "KNOWLEDGE_BASE"
+                }
+            )
         )
         return {"response": response["output"]["text"]}
     except Exception as e:
@@ -9,18 +9,30 @@
 from fastapi import FastAPI, Request, Query, HTTPException
 from fastapi.staticfiles import StaticFiles
 from fastapi.templating import Jinja2Templates
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
-import boto3
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
+from pydantic import BaseModel, TypeAdapter, ValidationError
+import aioboto3
+import botocore.session
+import httpx
 import os
-import json
+import re
+import orjson
 from dotenv import load_dotenv
 import logging
+from botocore.auth import SigV4Auth
+from botocore.awsrequest import AWSRequest
+from botocore.config import Config
 from botocore.exceptions import BotoCoreError, ClientError
 import asyncio
+from collections import OrderedDict
 
-# Configure logging
-logging.basicConfig(level=logging.INFO)
+# Configure logging; raise LOG_LEVEL to WARNING in production to skip
+# formatting error details entirely
+logging.basicConfig(
+    level=os.getenv("LOG_LEVEL", "INFO"),
+    format="%(asctime)s %(levelname)s %(name)s %(message)s",
+)
 logger = logging.getLogger(__name__)
 
 # Load environment variables from .env file
@@ -36,6 +48,15 @@ MODEL_ARN = os.getenv("MODEL_ARN")
 if not AWS_REGION:
     raise ValueError("AWS_REGION environment variable is missing.")
 
+# Frozen at import: configuration is environment-driven and never changes at
+# runtime, so handlers test these booleans instead of re-deriving them
+_MODEL_CONFIGURED = bool(MODEL_ID)
+_KB_CONFIGURED = bool(KNOWLEDGE_BASE_ID and MODEL_ARN)
+if not _MODEL_CONFIGURED:
+    logger.warning("MODEL_ID is not set; general model endpoints will return 500.")
+if not _KB_CONFIGURED:
+    logger.warning("KNOWLEDGE_BASE_ID/MODEL_ARN are not set; knowledge base endpoints will return 500.")
+
 # System prompt to guide the assistant's behavior
 SYSTEM_PROMPT = (
     "You are a medical knowledge assistant.\n"
@@ -45,12 +66,68 @@ SYSTEM_PROMPT = (
     "- Always cite the source with document name."
 )
 
+# Constant converse kwargs, built once instead of per request; the tuple keeps
+# the system block immutable
+_SYSTEM_BLOCKS = ({"text": SYSTEM_PROMPT},)
+_INFER_CFG = {"maxTokens": 512, "temperature": 0.5}
+# Latency-optimized inference routing; set BEDROCK_LATENCY_OPTIMIZED=0 for
+# models that don't support it
+_PERF_CFG = {
+    "latency": "optimized" if os.getenv("BEDROCK_LATENCY_OPTIMIZED", "1") == "1" else "standard"
+}
+# Prompt template so the system prompt actually reaches the KB generation model
+_KB_GEN_CFG = {
+    "promptTemplate": {
+        "textPromptTemplate": (
+            SYSTEM_PROMPT + "\n\n$search_results$\n\nUser: $query$\n\nAssistant:"
+        )
+    },
+    "performanceConfig": _PERF_CFG,
+}
+# Constant retrieve-and-generate configuration shared by all KB call sites
+_RAG_CONFIG = {
+    "knowledgeBaseConfiguration": {
+        "knowledgeBaseId": KNOWLEDGE_BASE_ID,
+        "modelArn": MODEL_ARN,
+        "generationConfiguration": _KB_GEN_CFG,
+    },
+    "type": "KNOWLEDGE_BASE",
+}
+
 # Pydantic models for request/response
 class ChatMessage(BaseModel):
     message: str
     use_knowledge_base: bool = False
 
-app = FastAPI()
+class ChatBatch(BaseModel):
+    messages: list[ChatMessage]
+
+# Reused TypeAdapters validate the raw request bytes in one Rust-side parse,
+# skipping the intermediate Python dict FastAPI's default body handling builds
+_CHAT_ADAPTER = TypeAdapter(ChatMessage)
+_CHAT_BATCH_ADAPTER = TypeAdapter(ChatBatch)
+
+# Serialize all JSON responses with orjson instead of stdlib json
+app = FastAPI(default_response_class=ORJSONResponse)
+
+# Streaming endpoints that must not be gzipped: the pinned starlette's gzip
+# responder buffers streamed chunks without flushing, which would hold SSE
+# tokens back until the stream ends
+_SSE_PATHS = {"/chat/stream", "/bedrock/stream"}
+
+
+class _SSEAwareGZipMiddleware(GZipMiddleware):
+    """GZipMiddleware that leaves the SSE endpoints uncompressed."""
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope.get("path") in _SSE_PATHS:
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+
+# Compress larger JSON bodies (RAG answers with citations reach tens of KB)
+app.add_middleware(_SSEAwareGZipMiddleware, minimum_size=1024, compresslevel=5)
 
 # Serve static files like CSS, JS, images
 app.mount("/static", StaticFiles(directory="static"), name="static")
@@ -62,129 +139,263 @@ templates = Jinja2Templates(directory="templates")
 async def home(request: Request):
     return templates.TemplateResponse("chat.html", {"request": request})
 
-# Initialize AWS clients once during application startup
-try:
-    bedrock_client = boto3.client("bedrock-runtime", region_name=AWS_REGION)
-    bedrock_agent_client = boto3.client("bedrock-agent-runtime", region_name=AWS_REGION)
-except (BotoCoreError, ClientError) as e:
-    logger.error(f"Failed to initialize AWS clients: {e}")
-    raise
+# Shared aioboto3 session; clients are created per request so calls are truly
+# async (no event-loop blocking) and credentials refresh automatically
+session = aioboto3.Session()
+
+# The default pool of 10 connections queues concurrent requests on TCP slots;
+# widen it so in-flight Bedrock calls aren't serialized at the transport layer
+_BOTO_CFG = Config(
+    max_pool_connections=int(os.getenv("BEDROCK_MAX_POOL_CONNECTIONS", "64")),
+    retries={"max_attempts": 3, "mode": "adaptive"},
+    tcp_keepalive=True,
+)
 
 
-def _extract_document_titles_from_citations(rag_response: dict):
-    """Best-effort extraction of document titles from Bedrock RAG citations.
+def bedrock_client_factory():
+    """Return an async context manager yielding a Bedrock Runtime client."""
+    return session.client("bedrock-runtime", region_name=AWS_REGION, config=_BOTO_CFG)
+
+
+def bedrock_agent_client_factory():
+    """Return an async context manager yielding a Bedrock Agent Runtime client."""
+    return session.client("bedrock-agent-runtime", region_name=AWS_REGION, config=_BOTO_CFG)
+
+
+# Opt-in native HTTP backend: sign Converse requests with SigV4 and POST them
+# straight to the Bedrock runtime, skipping the boto3 call stack per request.
+# Enable with BEDROCK_HTTP_BACKEND=httpx; streaming stays on aioboto3.
+_USE_HTTPX_BACKEND = os.getenv("BEDROCK_HTTP_BACKEND", "boto3") == "httpx"
+_HTTPX = None
+_sigv4 = None
+
+
+@app.on_event("startup")
+async def _open_httpx_client():
+    global _HTTPX
+    if _USE_HTTPX_BACKEND:
+        _HTTPX = httpx.AsyncClient(
+            limits=httpx.Limits(max_connections=128, max_keepalive_connections=64)
+        )
+
+
+@app.on_event("shutdown")
+async def _close_httpx_client():
+    if _HTTPX is not None:
+        await _HTTPX.aclose()
+
+
+def _get_sigv4() -> SigV4Auth:
+    """Build the SigV4 signer once from the default credential chain."""
+    global _sigv4
+    if _sigv4 is None:
+        credentials = botocore.session.get_session().get_credentials()
+        if credentials is None:
+            raise HTTPException(status_code=500, detail="AWS credentials are not configured.")
+        _sigv4 = SigV4Auth(credentials, "bedrock", AWS_REGION)
+    return _sigv4
+
+
+async def _converse_httpx(messages: list) -> dict:
+    """POST a SigV4-signed Converse request directly to the Bedrock runtime."""
+    url = f"https://bedrock-runtime.{AWS_REGION}.amazonaws.com/model/{MODEL_ID}/converse"
+    payload = {
+        "system": _SYSTEM_BLOCKS,
+        "messages": messages,
+        "inferenceConfig": _INFER_CFG,
+        "performanceConfig": _PERF_CFG,
+    }
+    data = orjson.dumps(payload)
+    aws_request = AWSRequest(
+        method="POST", url=url, data=data, headers={"Content-Type": "application/json"}
+    )
+    _get_sigv4().add_auth(aws_request)
+    response = await _HTTPX.post(url, content=data, headers=dict(aws_request.headers))
+    response.raise_for_status()
+    return orjson.loads(response.content)
+
+
+async def _converse(messages: list) -> dict:
+    """Run a Converse call through the configured backend (aioboto3 or signed httpx)."""
+    if _USE_HTTPX_BACKEND and _HTTPX is not None:
+        return await _converse_httpx(messages)
+    async with bedrock_client_factory() as bedrock_client:
+        return await bedrock_client.converse(
+            modelId=MODEL_ID,
+            system=_SYSTEM_BLOCKS,
+            messages=messages,
+            inferenceConfig=_INFER_CFG,
+            performanceConfig=_PERF_CFG,
+        )
+
+
+# Metadata keys checked for document titles / file names, in preference order
+_TITLE_KEYS = ("x-amz-bedrock-kb-document-title", "x-amzn-bedrock-kb-doc-title")
+_NAME_KEYS = ("file_name", "filename", *_TITLE_KEYS)
+
+
+# Async LRU cache for knowledge base queries, keyed on the normalized question
+# text; repeated questions skip the Bedrock round trip entirely
+_KB_CACHE_MAX = int(os.getenv("KB_CACHE_MAXSIZE", "512"))
+_kb_cache: OrderedDict = OrderedDict()
+_kb_cache_lock = asyncio.Lock()
+# Single-flight map: concurrent identical questions share one Bedrock call
+# instead of each paying the multi-second, billable round trip
+_kb_inflight: dict = {}
+
+
+async def _kb_fetch(key: str, text: str, entry: list) -> dict:
+    """Upstream retrieve_and_generate call shared by all coalesced waiters."""
+    try:
+        async with bedrock_agent_client_factory() as bedrock_agent_client:
+            response = await bedrock_agent_client.retrieve_and_generate(
+                input={"text": text},
+                retrieveAndGenerateConfiguration=_RAG_CONFIG,
+            )
+        async with _kb_cache_lock:
+            _kb_cache[key] = response
+            if len(_kb_cache) > _KB_CACHE_MAX:
+                _kb_cache.popitem(last=False)
+        return response
+    finally:
+        # Plain dict ops, safe even while this task is being cancelled; only
+        # drop our own entry in case a newer task was registered meanwhile
+        if _kb_inflight.get(key) is entry:
+            del _kb_inflight[key]
+
+
+async def _kb_query(text: str) -> dict:
+    """Run retrieve_and_generate for text, serving repeated queries from an LRU cache.
+
+    Identical queries already in flight are coalesced onto one shared upstream
+    task; the LRU covers repeats over time, the in-flight map repeats at the
+    same moment. Each caller awaits the task through asyncio.shield so one
+    client's disconnect cannot cancel everyone else's request; the task itself
+    is only cancelled once no waiters remain.
+    """
+    key = text.strip().lower()
+    async with _kb_cache_lock:
+        if key in _kb_cache:
+            _kb_cache.move_to_end(key)
+            return _kb_cache[key]
+        entry = _kb_inflight.get(key)
+        if entry is None:
+            entry = [None, 0]
+            entry[0] = asyncio.create_task(_kb_fetch(key, text, entry))
+            _kb_inflight[key] = entry
+        entry[1] += 1
+    task = entry[0]
+    try:
+        return await asyncio.shield(task)
+    finally:
+        entry[1] -= 1
+        if entry[1] == 0 and not task.done():
+            # Detach before cancelling (no await in between) so a caller
+            # arriving afterwards starts a fresh task instead of joining the
+            # doomed one and inheriting its CancelledError
+            if _kb_inflight.get(key) is entry:
+                del _kb_inflight[key]
+            task.cancel()
+
+
+@app.post("/admin/cache/clear")
+async def clear_kb_cache():
+    """Operator endpoint that empties the knowledge base query cache."""
+    async with _kb_cache_lock:
+        size = len(_kb_cache)
+        _kb_cache.clear()
+    return {"cleared": size}
+
+
+def _url_basename(u: str) -> str:
+    """Last path segment of a URI/URL, without any query string."""
+    tail = u.rsplit("/", 1)[-1]
+    q = tail.find("?")
+    return tail if q < 0 else tail[:q]
+
+
+def _extract_citation_info(rag_response: dict):
+    """Extract (document titles, PDF file names) from Bedrock RAG citations in one pass.
 
     Supports both shapes:
     - { "citations": { "retrievedReferences": [...] }}
     - { "citations": [ { "retrievedReferences": [...] }, ... ] }
     """
     titles = []
+    filenames = []
     try:
-        raw_citations = (rag_response or {}).get("citations", [])
+        raw_citations = rag_response.get("citations") if rag_response else None
         retrieved_refs = []
         if isinstance(raw_citations, dict):
-            retrieved_refs = raw_citations.get("retrievedReferences", [])
+            retrieved_refs = raw_citations.get("retrievedReferences") or []
         elif isinstance(raw_citations, list):
             for c in raw_citations:
-                retrieved_refs.extend((c or {}).get("retrievedReferences", []))
+                if c:
+                    retrieved_refs.extend(c.get("retrievedReferences") or [])
         for ref in retrieved_refs:
-            metadata = (ref or {}).get("metadata", {}) or {}
-            title = (
-                metadata.get("x-amz-bedrock-kb-document-title")
-                or metadata.get("x-amzn-bedrock-kb-doc-title")
-            )
-            if not title:
-                location = (ref or {}).get("location", {}) or {}
-                s3_uri = (location.get("s3Location", {}) or {}).get("uri")
-                web_url = (location.get("webLocation", {}) or {}).get("url")
-                uri_or_url = s3_uri or web_url or ""
-                if uri_or_url:
-                    try:
-                        title = os.path.basename(uri_or_url).split("?")[0]
-                    except Exception:
-                        title = uri_or_url
+            if not ref:
+                continue
+            metadata = ref.get("metadata")
+            location = ref.get("location")
+            # Plain None checks instead of chained 'or {}' guards, which would
+            # allocate a fresh empty dict per evaluation
+            uri_or_url = None
+            if location:
+                s3_location = location.get("s3Location")
+                if s3_location:
+                    uri_or_url = s3_location.get("uri")
+                if not uri_or_url:
+                    web_location = location.get("webLocation")
+                    if web_location:
+                        uri_or_url = web_location.get("url")
+            basename = _url_basename(uri_or_url) if uri_or_url else ""
+
+            title = basename
+            # Prefer explicit locations for reliable file paths, then metadata
+            name = basename
+            if metadata:
+                title = next((metadata[k] for k in _TITLE_KEYS if metadata.get(k)), None) or basename
+                if not name:
+                    name = next((metadata[k] for k in _NAME_KEYS if metadata.get(k)), "")
             if title:
                 titles.append(title)
+            if name and name.endswith((".pdf", ".PDF")):
+                filenames.append(name)
     except Exception:
         pass
-    # De-duplicate while preserving order
-    seen = set()
-    unique_titles = []
-    for t in titles:
-        if t not in seen:
-            seen.add(t)
-            unique_titles.append(t)
-    return unique_titles
+    # De-duplicate while preserving order; dict.fromkeys does this in one
+    # C-level pass instead of a Python loop over a set/list pair
+    return list(dict.fromkeys(titles)), list(dict.fromkeys(filenames))
+
+
+def _extract_document_titles_from_citations(rag_response: dict):
+    """Best-effort extraction of document titles from Bedrock RAG citations."""
+    return _extract_citation_info(rag_response)[0]
 
 
 def _extract_pdf_filenames_from_citations(rag_response: dict):
-    """Return only PDF file names from RAG citations (basename like example.pdf).
+    """Return only PDF file names from RAG citations (basename like example.pdf)."""
+    return _extract_citation_info(rag_response)[1]
 
-    Handles both dict and list shapes of the "citations" field.
-    """
-    filenames = []
-    try:
-        raw_citations = (rag_response or {}).get("citations", [])
-        retrieved_refs = []
-        if isinstance(raw_citations, dict):
-            retrieved_refs = raw_citations.get("retrievedReferences", [])
-        elif isinstance(raw_citations, list):
-            for c in raw_citations:
-                retrieved_refs.extend((c or {}).get("retrievedReferences", []))
-        for ref in retrieved_refs:
-            # Prefer explicit locations for reliable file paths
-            location = (ref or {}).get("location", {}) or {}
-            s3_uri = (location.get("s3Location", {}) or {}).get("uri")
-            web_url = (location.get("webLocation", {}) or {}).get("url")
-            candidate = s3_uri or web_url or ""
-            name = ""
-            if candidate:
-                try:
-                    name = os.path.basename(candidate).split("?")[0]
-                except Exception:
-                    name = candidate
-            # Fallback to metadata fields
-            if not name:
-                metadata = (ref or {}).get("metadata", {}) or {}
-                name = (
-                    metadata.get("file_name")
-                    or metadata.get("filename")
-                    or metadata.get("x-amz-bedrock-kb-document-title")
-                    or metadata.get("x-amzn-bedrock-kb-doc-title")
-                    or ""
-                )
-            if name and name.lower().endswith(".pdf"):
-                filenames.append(name)
-    except Exception:
-        pass
-    # De-duplicate while preserving order
-    seen = set()
-    result = []
-    for n in filenames:
-        if n not in seen:
-            seen.add(n)
-            result.append(n)
-    return result
-
-
-def _format_one_line_bullets(text: str) -> str:
-    """Ensure hyphen bullets are one per line, starting with '- '."""
-    if not isinstance(text, str) or not text:
-        return text
-    # Normalize common inline separators to newline bullets
-    if " - " in text:
-        formatted = text.replace(" - ", "\n- ")
-        if not formatted.lstrip().startswith("- "):
-            formatted = "- " + formatted.lstrip()
-        return formatted
-    return text
 
+# Both cleanups (inline bullet separators, bold markers) fused into one
+# compiled pattern so long outputs get a single C-level pass instead of
+# several full str.replace passes
+_FIX_RE = re.compile(r" - |\*\*")
+_FIX_SUB = {" - ": "\n- ", "**": ""}.get
 
-def _remove_bold_markdown(text: str) -> str:
-    """Strip double-asterisk markdown bold markers from text."""
+
+def _finalize_body(text: str) -> str:
+    """Reflow inline ' - ' separators to newline bullets and strip bold markers."""
     if not isinstance(text, str) or not text:
         return text
-    return text.replace("**", "")
+    had_inline_bullets = " - " in text
+    formatted = _FIX_RE.sub(lambda m: _FIX_SUB(m.group(0), ""), text)
+    if had_inline_bullets:
+        stripped = formatted.lstrip()
+        if stripped[:2] != "- ":
+            return "- " + stripped
+    return formatted
 
 
 def _finalize_output(body_text: str, pdf_filenames: list | None = None) -> str:
@@ -192,9 +403,7 @@ def _finalize_output(body_text: str, pdf_filenames: list | None = None) -> str:
 
     Ensures the final output ends with a newline character.
     """
-    text = _format_one_line_bullets(body_text or "")
-    text = _remove_bold_markdown(text)
-    text = text.rstrip()
+    text = _finalize_body(body_text or "").rstrip()
     if pdf_filenames:
         # Force a paragraph break and a line break using Unicode separators
         paragraph_break = "\u2029\u2028"
@@ -208,19 +417,12 @@ async def invoke_model(text: str = Query(..., description="Input text for the mo
     """
     Endpoint for invoking the model with a system prompt.
     """
-    if not MODEL_ID:
+    if not _MODEL_CONFIGURED:
         raise HTTPException(status_code=500, detail="MODEL_ID is not configured.")
     
     try:
         # Use Bedrock Converse API to pass a system prompt (works with amazon.nova-pro-v1:0)
-        response = bedrock_client.converse(
-            modelId=MODEL_ID,
-            system=[{"text": SYSTEM_PROMPT}],
-            messages=[
-                {"role": "user", "content": [{"text": text}]}
-            ],
-            inferenceConfig={"maxTokens": 512, "temperature": 0.5},
-        )
+        response = await _converse([{"role": "user", "content": [{"text": text}]}])
 
         # Extract the generated text
         generated_text = ""
@@ -236,13 +438,13 @@ async def invoke_model(text: str = Query(..., description="Input text for the mo
         
         return {"response": _finalize_output(generated_text)}
     except ClientError as e:
-        logger.error(f"AWS ClientError: {e}")
+        logger.error("AWS ClientError: %s", e)
         raise HTTPException(status_code=500, detail=f"AWS Client error: {str(e)}")
     except BotoCoreError as e:
-        logger.error(f"AWS BotoCoreError: {e}")
+        logger.error("AWS BotoCoreError: %s", e)
         raise HTTPException(status_code=500, detail=f"AWS BotoCore error: {str(e)}")
     except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+        logger.error("Unexpected error: %s", e)
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
 
@@ -251,98 +453,228 @@ async def query_with_knowledge_base(text: str = Query(..., description="Input te
     """
     Endpoint for model invocation with knowledge base retrieval and generation.
     """
-    if not KNOWLEDGE_BASE_ID or not MODEL_ARN:
+    if not _KB_CONFIGURED:
         raise HTTPException(status_code=500, detail="Knowledge base configuration is missing.")
     
     try:
-        # Include system guidance inline to steer formatting
-        input_text = f"{SYSTEM_PROMPT}\n\nUser: {text}"
-        response = bedrock_agent_client.retrieve_and_generate(
-            input={"text": text},
-            retrieveAndGenerateConfiguration={
-                "knowledgeBaseConfiguration": {
-                    "knowledgeBaseId": KNOWLEDGE_BASE_ID,
-                    "modelArn": MODEL_ARN
-                },
-                "type": "KNOWLEDGE_BASE"
-            }
-        )
+        response = await _kb_query(text)
         body = response["output"]["text"]
         pdfs = _extract_pdf_filenames_from_citations(response)
         return {"response": _finalize_output(body, pdfs)}
     except ClientError as e:
-        logger.error(f"AWS ClientError: {e}")
+        logger.error("AWS ClientError: %s", e)
         raise HTTPException(status_code=500, detail="AWS Client error occurred.")
     except BotoCoreError as e:
-        logger.error(f"AWS BotoCoreError: {e}")
+        logger.error("AWS BotoCoreError: %s", e)
         raise HTTPException(status_code=500, detail="AWS BotoCore error occurred.")
     except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+        logger.error("Unexpected error: %s", e)
         raise HTTPException(status_code=500, detail="An unexpected error occurred.")
 
+async def _one_chat(chat_request: ChatMessage) -> dict:
+    """Handle a single chat message; shared by /chat and /chat/batch."""
+    if chat_request.use_knowledge_base:
+        # Use knowledge base for retrieval
+        if not _KB_CONFIGURED:
+            raise HTTPException(status_code=500, detail="Knowledge base configuration is missing.")
+
+        response = await _kb_query(chat_request.message)
+        body = response["output"]["text"]
+        pdfs = _extract_pdf_filenames_from_citations(response)
+        return {"response": _finalize_output(body, pdfs), "type": "knowledge_base"}
+    else:
+        # Use regular model invocation
+        if not _MODEL_CONFIGURED:
+            raise HTTPException(status_code=500, detail="MODEL_ID is not configured.")
+
+        # Use Bedrock Converse API with system prompt
+        response = await _converse([{"role": "user", "content": [{"text": chat_request.message}]}])
+
+        # Extract the generated text
+        generated_text = ""
+        try:
+            contents = response["output"]["message"]["content"]
+            generated_text = "".join(block.get("text", "") for block in contents)
+        except Exception:
+            generated_text = ""
+
+        if not generated_text:
+            logger.error("Model did not return any content.")
+            raise HTTPException(status_code=500, detail="Model did not return any content.")
+
+        return {"response": _finalize_output(generated_text), "type": "general"}
+
+
 @app.post("/chat")
-async def chat_endpoint(chat_request: ChatMessage):
+async def chat_endpoint(request: Request):
     """
     Endpoint for chat interface that handles both general queries and knowledge base queries.
     """
     try:
-        if chat_request.use_knowledge_base:
-            # Use knowledge base for retrieval
-            if not KNOWLEDGE_BASE_ID or not MODEL_ARN:
-                raise HTTPException(status_code=500, detail="Knowledge base configuration is missing.")
-            
-            response = bedrock_agent_client.retrieve_and_generate(
-                input={"text": chat_request.message},
-                retrieveAndGenerateConfiguration={
-                    "knowledgeBaseConfiguration": {
-                        "knowledgeBaseId": KNOWLEDGE_BASE_ID,
-                        "modelArn": MODEL_ARN
-                    },
-                    "type": "KNOWLEDGE_BASE"
-                }
-            )
-            body = response["output"]["text"]
-            pdfs = _extract_pdf_filenames_from_citations(response)
-            return {"response": _finalize_output(body, pdfs), "type": "knowledge_base"}
-        else:
-            # Use regular model invocation
-            if not MODEL_ID:
-                raise HTTPException(status_code=500, detail="MODEL_ID is not configured.")
-            
-            # Use Bedrock Converse API with system prompt
-            response = bedrock_client.converse(
-                modelId=MODEL_ID,
-                system=[{"text": SYSTEM_PROMPT}],
-                messages=[
-                    {"role": "user", "content": [{"text": chat_request.message}]}
-                ],
-                inferenceConfig={"maxTokens": 512, "temperature": 0.5},
-            )
-
-            # Extract the generated text
-            generated_text = ""
-            try:
-                contents = response["output"]["message"]["content"]
-                generated_text = "".join(block.get("text", "") for block in contents)
-            except Exception:
-                generated_text = ""
-
-            if not generated_text:
-                logger.error("Model did not return any content.")
-                raise HTTPException(status_code=500, detail="Model did not return any content.")
-            
-            return {"response": _finalize_output(generated_text), "type": "general"}
-    
+        chat_request = _CHAT_ADAPTER.validate_json(await request.body())
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_input=False))
+    try:
+        return await _one_chat(chat_request)
     except ClientError as e:
-        logger.error(f"AWS ClientError: {e}")
+        logger.error("AWS ClientError: %s", e)
         raise HTTPException(status_code=500, detail=f"AWS Client error: {str(e)}")
     except BotoCoreError as e:
-        logger.error(f"AWS BotoCoreError: {e}")
+        logger.error("AWS BotoCoreError: %s", e)
         raise HTTPException(status_code=500, detail=f"AWS BotoCore error: {str(e)}")
     except Exception as e:
-        logger.error(f"Unexpected error: {e}")
+        logger.error("Unexpected error: %s", e)
         raise HTTPException(status_code=500, detail=f"Unexpected error: {str(e)}")
 
+
+@app.post("/chat/batch")
+async def chat_batch_endpoint(request: Request):
+    """
+    Endpoint that answers a batch of chat messages concurrently.
+
+    All messages are dispatched against Bedrock at once with asyncio.gather;
+    failures are reported per message so one bad prompt cannot fail the batch.
+    """
+    try:
+        batch = _CHAT_BATCH_ADAPTER.validate_json(await request.body())
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False, include_input=False))
+    tasks = [asyncio.create_task(_one_chat(m)) for m in batch.messages]
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    responses = []
+    for result in results:
+        if isinstance(result, HTTPException):
+            responses.append({"error": result.detail})
+        elif isinstance(result, (ClientError, BotoCoreError)):
+            logger.error("AWS error in batch chat: %s", result)
+            responses.append({"error": "AWS error occurred."})
+        elif isinstance(result, asyncio.CancelledError):
+            responses.append({"error": "Request was cancelled."})
+        elif isinstance(result, BaseException):
+            # gather(return_exceptions=True) can surface BaseExceptions too;
+            # none may reach serialization as a raw object
+            logger.error("Unexpected error in batch chat: %s", result)
+            responses.append({"error": "An unexpected error occurred."})
+        else:
+            responses.append(result)
+    return {"responses": responses}
+
+def _json_dumps(obj) -> str:
+    """Serialize with orjson; much faster than stdlib json for per-token SSE chunks."""
+    return orjson.dumps(obj).decode()
+
+
+# SSE responses must not be buffered by proxies, otherwise tokens arrive in bursts
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+
+
+async def _formatted_sse_tokens(token_iter):
+    """Yield SSE data events from an async token iterator.
+
+    Formatting helpers need complete lines to work on, so tokens are buffered
+    and flushed at newline boundaries rather than reformatted per chunk.
+    """
+    buffer = ""
+    async for token in token_iter:
+        buffer += token
+        if "\n" in buffer:
+            complete, _, buffer = buffer.rpartition("\n")
+            text = _finalize_body(complete + "\n")
+            yield f"data: {_json_dumps({'token': text})}\n\n"
+    if buffer:
+        text = _finalize_body(buffer)
+        yield f"data: {_json_dumps({'token': text})}\n\n"
+
+
+async def _converse_sse(text: str):
+    """Stream model tokens for a general query as SSE events."""
+    try:
+        async with bedrock_client_factory() as bedrock_client:
+            response = await bedrock_client.converse_stream(
+                modelId=MODEL_ID,
+                system=_SYSTEM_BLOCKS,
+                messages=[
+                    {"role": "user", "content": [{"text": text}]}
+                ],
+                inferenceConfig=_INFER_CFG,
+                performanceConfig=_PERF_CFG,
+            )
+
+            async def _tokens():
+                async for event in response["stream"]:
+                    token = event.get("contentBlockDelta", {}).get("delta", {}).get("text", "")
+                    if token:
+                        yield token
+
+            async for sse_event in _formatted_sse_tokens(_tokens()):
+                yield sse_event
+        yield f"data: {_json_dumps({'done': True, 'sources': []})}\n\n"
+    except (ClientError, BotoCoreError) as e:
+        logger.error("AWS error during streaming: %s", e)
+        yield f"data: {_json_dumps({'error': 'AWS error occurred.'})}\n\n"
+
+
+async def _rag_sse(text: str):
+    """Stream knowledge base answer tokens as SSE events, ending with sources."""
+    citations = []
+    try:
+        async with bedrock_agent_client_factory() as bedrock_agent_client:
+            response = await bedrock_agent_client.retrieve_and_generate_stream(
+                input={"text": text},
+                retrieveAndGenerateConfiguration=_RAG_CONFIG,
+            )
+
+            async def _tokens():
+                async for event in response["stream"]:
+                    if "citation" in event:
+                        citations.append(event["citation"].get("citation", event["citation"]))
+                    token = event.get("output", {}).get("text", "")
+                    if token:
+                        yield token
+
+            async for sse_event in _formatted_sse_tokens(_tokens()):
+                yield sse_event
+        pdfs = _extract_pdf_filenames_from_citations({"citations": citations})
+        yield f"data: {_json_dumps({'done': True, 'sources': pdfs})}\n\n"
+    except (ClientError, BotoCoreError) as e:
+        logger.error("AWS error during streaming: %s", e)
+        yield f"data: {_json_dumps({'error': 'AWS error occurred.'})}\n\n"
+
+
+@app.get("/bedrock/stream")
+async def stream_model(text: str = Query(..., description="Input text for the model")):
+    """
+    Streaming variant of /bedrock/invoke that sends tokens as they arrive.
+    """
+    if not _MODEL_CONFIGURED:
+        raise HTTPException(status_code=500, detail="MODEL_ID is not configured.")
+    return StreamingResponse(_converse_sse(text), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
+@app.post("/chat/stream")
+async def chat_stream_endpoint(chat_request: ChatMessage):
+    """
+    Streaming variant of /chat that sends tokens as they arrive via SSE.
+    """
+    if chat_request.use_knowledge_base:
+        if not _KB_CONFIGURED:
+            raise HTTPException(status_code=500, detail="Knowledge base configuration is missing.")
+        return StreamingResponse(_rag_sse(chat_request.message), media_type="text/event-stream", headers=SSE_HEADERS)
+    if not _MODEL_CONFIGURED:
+        raise HTTPException(status_code=500, detail="MODEL_ID is not configured.")
+    return StreamingResponse(_converse_sse(chat_request.message), media_type="text/event-stream", headers=SSE_HEADERS)
+
+
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="127.0.0.1", port=8000, reload=True)
+    # uvloop + httptools replace the default event loop and h11 parser; set
+    # RELOAD=1 during development (autoreload forces a single worker)
+    uvicorn.run(
+        "web_app:app",
+        host="127.0.0.1",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=int(os.getenv("WORKERS", str(os.cpu_count() or 1))),
+        reload=os.getenv("RELOAD", "0") == "1",
+    )